@@ -1,22 +1,24 @@
 import os
+import time
+import hashlib
 import jwt
-from fastapi import Depends, HTTPException
-from fastapi.security import OAuth2PasswordBearer
+from cachetools import TTLCache
+from fastapi import Depends, Header, HTTPException
 from starlette.status import HTTP_401_UNAUTHORIZED
 from dotenv import load_dotenv
 
 load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY")
+# Nyckeln som bytes en gång, så att PyJWT inte behöver koda om den vid varje anrop
+_SECRET_KEY_B = SECRET_KEY.encode() if SECRET_KEY else None
 
-oauth2_scheme = OAuth2PasswordBearer(
-    tokenUrl="/token",
-    auto_error=(os.getenv("MODE", "production") != "development")
-)
+# Cache för redan verifierade tokens, nyckeln är en sha256-hash av token
+_jwt_cache = TTLCache(maxsize=10000, ttl=60)
 
 
 
-def get_current_user(
-    token: str = Depends(oauth2_scheme),
+async def get_current_user(
+    authorization: str = Header(None, include_in_schema=False),
 ):
 
     credentials_exception = HTTPException(
@@ -25,14 +27,28 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
 
+    # Läs token direkt ur headern: "Bearer <token>"
+    scheme, _, token = (authorization or "").partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        raise credentials_exception
+
+    key = hashlib.sha256(token.encode()).hexdigest()
+    payload = _jwt_cache.get(key)
+    if payload is not None:
+        exp = payload.get("exp")
+        if exp is None or exp > time.time():
+            return {"user_id": payload["sub"], "email": payload["email"], "role": payload.get("role", []), "token": token}
+        _jwt_cache.pop(key, None)
+
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
+        payload = jwt.decode(token, _SECRET_KEY_B, algorithms=["HS256"])
         user_id: str = payload.get("sub")
         email: str = payload.get("email")
 
         if user_id is None or email is None:
             raise credentials_exception
 
+        _jwt_cache[key] = payload
         return {"user_id": user_id, "email": email, "role": payload.get("role", []), "token": token}
 
     except jwt.ExpiredSignatureError:
@@ -40,7 +56,7 @@ def get_current_user(
     except jwt.InvalidTokenError:
         raise credentials_exception
 
-def get_current_admin_user(user: dict = Depends(get_current_user)):
+async def get_current_admin_user(user: dict = Depends(get_current_user)):
     if "admin" not in user["role"]:
         raise HTTPException(status_code=HTTP_401_UNAUTHORIZED, detail="Åtkomst nekad")
     return user
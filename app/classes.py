@@ -1,23 +1,26 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import List
 
-class StockRequest(BaseModel):
+class InventoryModel(BaseModel):
+    model_config = ConfigDict(extra="ignore", str_strip_whitespace=True, frozen=True)
+
+class StockRequest(InventoryModel):
     productCode: str
     quantity: int
 
-class ProductDeleteRequest(BaseModel):
+class ProductDeleteRequest(InventoryModel):
     productCode: str 
 
-class DecreaseStockMultipleRequest(BaseModel):
+class DecreaseStockMultipleRequest(InventoryModel):
     items: List[StockRequest]
 
-class Product(BaseModel):
+class Product(InventoryModel):
     productCode: str
     stock: int
 
-class ProductCreate(BaseModel):
+class ProductCreate(InventoryModel):
     productCode: str
     stock: int
 
-class ProductDeleteMultipleRequest(BaseModel):
+class ProductDeleteMultipleRequest(InventoryModel):
     productCodes: list[str]
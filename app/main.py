@@ -1,13 +1,16 @@
 import os
 from typing import List
-from databases import Database
-from fastapi import FastAPI, HTTPException, Depends, Query
+import asyncpg
+from fastapi import FastAPI, HTTPException, Depends, Query, BackgroundTasks, Request
 from fastapi.openapi.utils import get_openapi
+from fastapi.responses import Response
 from app.classes import Product, ProductCreate, StockRequest, DecreaseStockMultipleRequest, ProductDeleteRequest
 from app.utils import ensure_valid_quantity
+from app import queries
 from app.auth.dependencies import get_current_user, get_current_admin_user
 from fastapi.middleware.cors import CORSMiddleware
-import requests
+from fastapi.middleware.gzip import GZipMiddleware
+import httpx
 
 app = FastAPI()
 
@@ -20,6 +23,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Komprimera större svar, t.ex. hela /inventory-listan
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 
 # =============================
 #           DATABASE
@@ -27,15 +33,35 @@ app.add_middleware(
 # =============================
 
 DATABASE_URL = os.getenv("DATABASE_URL")
-database = Database(DATABASE_URL)
 
 @app.on_event("startup")
 async def startup():
-    await database.connect()
+    app.state.pool = await asyncpg.create_pool(
+        DATABASE_URL,
+        min_size=10,
+        max_size=50,
+        max_inactive_connection_lifetime=300,
+        command_timeout=30,
+        statement_cache_size=1024,
+    )
+    # Delad klient så att anslutningarna till shipping-servicen återanvänds
+    app.state.http = httpx.AsyncClient(
+        timeout=10.0,
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=100),
+        http2=True,
+    )
+    # Bygg OpenAPI-schemat direkt så att första /docs-anropet inte behöver göra det
+    app.openapi_schema = custom_openapi()
 
 @app.on_event("shutdown")
 async def shutdown():
-    await database.disconnect() 
+    await app.state.pool.close()
+    await app.state.http.aclose()
+
+async def db_conn(request: Request):
+    """Hämta en anslutning från poolen, lämnas tillbaka innan svaret och background tasks körs (scope="function")"""
+    async with request.app.state.pool.acquire() as con:
+        yield con
 
 def custom_openapi():
     if app.openapi_schema:
@@ -53,10 +79,8 @@ def custom_openapi():
             "bearerFormat": "JWT",
         }
     }
-
-    for path in openapi_schema["paths"]:
-        for method in openapi_schema["paths"][path]:
-            openapi_schema["paths"][path][method]["security"] = [{"BearerAuth": []}]
+    # Global security gäller för alla endpoints, ingen loop per path behövs
+    openapi_schema["security"] = [{"BearerAuth": []}]
     app.openapi_schema = openapi_schema
     return app.openapi_schema
 
@@ -68,104 +92,120 @@ app.openapi = custom_openapi
 # =============================
 
 @app.get("/inventory", response_model=list[Product], tags=["Inventory"])
-async def get_full_inventory_stock():
-    query = "SELECT id, sku, stock FROM products"
-    rows = await database.fetch_all(query)
-    products = [Product(productCode=row["sku"], stock=row["stock"]) for row in rows]
-    return products
+async def get_full_inventory_stock(
+    con: asyncpg.Connection = Depends(db_conn, scope="function")
+):
+    # JSON-arrayen kommer färdig från databasen, inga Product-objekt behövs
+    payload = await con.fetchval(queries.SELECT_INVENTORY)
+    return Response(content=payload, media_type="application/json")
 
 @app.get("/inventory/", response_model=List[Product], tags=["Inventory"])
 async def get_stock_for_multiple_products(
-    productCodes: List[str] = Query(..., example=["foo", "bar"])
+    productCodes: List[str] = Query(..., example=["foo", "bar"]),
+    con: asyncpg.Connection = Depends(db_conn, scope="function")
 ):
-    query = "SELECT id, sku, stock FROM products WHERE sku = ANY(:codes)"
-    rows = await database.fetch_all(query, values={"codes": tuple(productCodes)})
-    if not rows:
+    payload = await con.fetchval(queries.SELECT_PRODUCTS, productCodes)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Produkter finns inte")
-    return [Product(productCode=row["sku"], stock=row["stock"]) for row in rows]
+    return Response(content=payload, media_type="application/json")
 
 @app.post("/inventory", response_model=list[Product], status_code=201, tags=["Inventory Management"])
 async def create_products(
     products: list[ProductCreate],
-    admin: dict = Depends(get_current_admin_user)
+    admin: dict = Depends(get_current_admin_user),
+    con: asyncpg.Connection = Depends(db_conn, scope="function")
 ):
-    new_products = []
-    for product in products:
-        query = """
-            INSERT INTO products (sku, stock) 
-            VALUES (:productCode, :stock) 
-            RETURNING id, sku, stock
-        """
-        row = await database.fetch_one(query, values={"productCode": product.productCode, "stock": product.stock})
-        new_products.append(Product(productCode=row["sku"], stock=row["stock"]))
-    return new_products
+    skus = [product.productCode for product in products]
+    try:
+        # fetchmany skickar alla rader i ett och samma protokollmeddelande
+        rows = await con.fetchmany(queries.INSERT_PRODUCT, [(product.productCode, product.stock) for product in products])
+    except asyncpg.UniqueViolationError:
+        # fetchmany är atomisk, inget har sparats. Ta reda på vilken produktkod som krockade
+        existing = {row["sku"] for row in await con.fetch(queries.SELECT_EXISTING_SKUS, skus)}
+        duplicate = next((sku for sku in skus if sku in existing or skus.count(sku) > 1), skus[0])
+        raise HTTPException(
+            status_code=400,
+            detail=f"Produkten med produktkod {duplicate} finns redan."
+        )
+    return [Product(productCode=row["sku"], stock=row["stock"]) for row in rows]
 
 @app.delete("/inventory", status_code=200, tags=["Inventory Management"])
 async def delete_products(
     requests: list[ProductDeleteRequest],
-    admin: dict = Depends(get_current_admin_user)
+    admin: dict = Depends(get_current_admin_user),
+    con: asyncpg.Connection = Depends(db_conn, scope="function")
 ):
-    messages = []
-    for request in requests:
-        query = "SELECT id, sku FROM products WHERE sku = :productCode"
-        row = await database.fetch_one(query, values={"productCode": request.productCode})
-        if row is None:
-            raise HTTPException(status_code=404, detail=f"Produkten {request.productCode} finns inte")
-        delete_query = "DELETE FROM products WHERE sku = :productCode"
-        await database.execute(delete_query, values={"productCode": request.productCode})
-        messages.append(f"Produkten {request.productCode} är borttagen")
-    return {"message": messages}
+    skus = [request.productCode for request in requests]
+    async with con.transaction():
+        rows = await con.fetch(queries.DELETE_PRODUCTS, skus)
+        deleted = {row["sku"] for row in rows}
+        for sku in skus:
+            if sku not in deleted:
+                raise HTTPException(status_code=404, detail=f"Produkten {sku} finns inte")
+    return {"message": [f"Produkten {sku} är borttagen" for sku in skus]}
 
 # =============================
 #        INVENTORY SALDO
 #        öka/sänka saldo
 # =============================
 
-@app.post("/inventory/increase", response_model=Product, tags=["Stock Management"])
+@app.post("/inventory/increase", response_model=list[Product], tags=["Stock Management"])
 async def increase_stock(
-    request: StockRequest,
-    admin: dict = Depends(get_current_admin_user)
+    requests: list[StockRequest],
+    admin: dict = Depends(get_current_admin_user),
+    con: asyncpg.Connection = Depends(db_conn, scope="function")
 ):
-    query = "SELECT id, sku, stock FROM products WHERE sku = :productCode"
-    row = await database.fetch_one(query, values={"productCode": request.productCode})
-    if row is None:
-        raise HTTPException(status_code=404, detail=f"Produkten {request.productCode} finns inte")
-    ensure_valid_quantity(request.quantity)
-    update_query = """
-        UPDATE products SET stock = stock + :quantity 
-        WHERE sku = :productCode 
-        RETURNING id, sku, stock
-    """
-    updated = await database.fetch_one(update_query, values={"quantity": request.quantity, "productCode": request.productCode})
-    return Product(productCode=updated["sku"], stock=updated["stock"])
+    for request in requests:
+        ensure_valid_quantity(request.quantity)
+
+    quantities = {}
+    for request in requests:
+        quantities[request.productCode] = quantities.get(request.productCode, 0) + request.quantity
+
+    async with con.transaction():
+        # RETURNING ger bara de produkter som finns, ingen separat SELECT behövs
+        rows = await con.fetch(queries.INCREASE_STOCK, list(quantities.keys()), list(quantities.values()))
+        stock_by_sku = {row["sku"]: row["stock"] for row in rows}
+        for sku in quantities:
+            if sku not in stock_by_sku:
+                raise HTTPException(status_code=404, detail=f"Produkten {sku} finns inte")
+
+    return [Product(productCode=request.productCode, stock=stock_by_sku[request.productCode]) for request in requests]
 
 @app.post("/inventory/decrease", response_model=list[Product], tags=["Stock Management"])
 async def decrease_stock(
     request: DecreaseStockMultipleRequest, 
-    user: dict = Depends(get_current_user)
+    background: BackgroundTasks,
+    user: dict = Depends(get_current_user),
+    con: asyncpg.Connection = Depends(db_conn, scope="function")
 ):
-    async with database.transaction():
-        updated_products = []
-        shipped_info = []  # store the ordered quantities
-        for item in request.items:
-            query = "SELECT id, sku, stock FROM products WHERE sku = :productCode FOR UPDATE"
-            row = await database.fetch_one(query, values={"productCode": item.productCode})
-            if row is None:
-                raise HTTPException(status_code=404, detail=f"Produkten {item.productCode} finns inte")
-            ensure_valid_quantity(item.quantity)
-            if row["stock"] < item.quantity:
-                raise HTTPException(status_code=400, detail=f"Inte tillräckligt med lagersaldo för {item.productCode}")
-            update_query = """
-                UPDATE products SET stock = stock - :quantity 
-                WHERE sku = :productCode 
-                RETURNING id, sku, stock
-            """
-            updated = await database.fetch_one(update_query, values={"quantity": item.quantity, "productCode": item.productCode})
-            updated_products.append(Product(productCode=updated["sku"], stock=updated["stock"]))
-            shipped_info.append({"productCode": item.productCode, "quantity": item.quantity})
-        if "admin" not in user.get("role", []):
-            await send_shipping_confirmation(user["token"], shipped_info)
-        return updated_products
+    for item in request.items:
+        ensure_valid_quantity(item.quantity)
+
+    # Samma produkt kan förekomma flera gånger, summera kvantiteterna per sku
+    quantities = {}
+    for item in request.items:
+        quantities[item.productCode] = quantities.get(item.productCode, 0) + item.quantity
+
+    async with con.transaction():
+        rows = await con.fetch(queries.DECREASE_STOCK, list(quantities.keys()), list(quantities.values()))
+        stock_by_sku = {row["sku"]: row["stock"] for row in rows}
+
+        if len(stock_by_sku) != len(quantities):
+            # Ta reda på vilken produkt som felade, transaktionen rullas tillbaka av felet
+            failed = [sku for sku in quantities if sku not in stock_by_sku]
+            existing = {row["sku"] for row in await con.fetch(queries.SELECT_EXISTING_SKUS, failed)}
+            for sku in failed:
+                if sku not in existing:
+                    raise HTTPException(status_code=404, detail=f"Produkten {sku} finns inte")
+                raise HTTPException(status_code=400, detail=f"Inte tillräckligt med lagersaldo för {sku}")
+
+    updated_products = [Product(productCode=item.productCode, stock=stock_by_sku[item.productCode]) for item in request.items]
+    shipped_info = [{"productCode": item.productCode, "quantity": item.quantity} for item in request.items]
+    if "admin" not in user.get("role", []):
+        # Körs efter att svaret skickats, klienten behöver inte vänta på email-servicen
+        background.add_task(send_shipping_confirmation, user["token"], shipped_info)
+    return updated_products
 
 # =============================
 #           SHIPPING
@@ -185,17 +225,22 @@ async def send_shipping_confirmation(token: str, shipped_info: list[dict]):
 </html>
 """
     subject = "Beställning skickad"
-    response = requests.post(
-        'https://email-service-git-email-service-api.2.rahtiapp.fi/shipping',
-        headers={
-            "Authorization": f"Bearer {token}",
-            "Content-Type": "application/json"
-        },
-        json={
-            'subject': subject,
-            'body': body
-        }
-    )
+    # Körs som background task, så fel måste fångas här och inte bubbla upp till ASGI
+    try:
+        response = await app.state.http.post(
+            'https://email-service-git-email-service-api.2.rahtiapp.fi/shipping',
+            headers={
+                "Authorization": f"Bearer {token}",
+                "Content-Type": "application/json"
+            },
+            json={
+                'subject': subject,
+                'body': body
+            }
+        )
+    except httpx.HTTPError as e:
+        print(f"Kunde inte skicka försändelsebekräftelse: {e!r}")
+        return
     if response.status_code == 200:
         print("Försändelsebekräftelse skickad")
     else:
@@ -0,0 +1,45 @@
+# =============================
+#   SQL som används av endpoints
+#   asyncpg:s statement cache
+#   återanvänder dem per anslutning
+# =============================
+
+# Postgres bygger JSON-svaret direkt, en rad med en färdig array
+SELECT_INVENTORY = """
+    SELECT coalesce(json_agg(json_build_object('productCode', sku, 'stock', stock)), '[]')
+    FROM products
+"""
+
+SELECT_PRODUCTS = """
+    SELECT json_agg(json_build_object('productCode', sku, 'stock', stock))
+    FROM products
+    WHERE sku = ANY($1::text[])
+"""
+
+SELECT_EXISTING_SKUS = "SELECT sku FROM products WHERE sku = ANY($1::text[])"
+
+INSERT_PRODUCT = """
+    INSERT INTO products (sku, stock) 
+    VALUES ($1, $2) 
+    RETURNING id, sku, stock
+"""
+
+DELETE_PRODUCTS = "DELETE FROM products WHERE sku = ANY($1::text[]) RETURNING sku"
+
+INCREASE_STOCK = """
+    UPDATE products p SET stock = p.stock + v.qty
+    FROM unnest($1::text[], $2::int[]) AS v(sku, qty)
+    WHERE p.sku = v.sku
+    RETURNING p.sku, p.stock
+"""
+
+# Uppdaterar bara rader med tillräckligt saldo, allt i en och samma query
+DECREASE_STOCK = """
+    WITH req(sku, qty) AS (
+        SELECT * FROM unnest($1::text[], $2::int[])
+    )
+    UPDATE products p SET stock = p.stock - r.qty
+    FROM req r
+    WHERE p.sku = r.sku AND p.stock >= r.qty
+    RETURNING p.sku, p.stock
+"""
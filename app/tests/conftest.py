@@ -0,0 +1,77 @@
+import time
+import jwt
+import pytest
+from contextlib import asynccontextmanager
+from fastapi.testclient import TestClient
+from app import main, queries
+from app.auth import dependencies
+
+SECRET = "test-secret-som-ar-minst-32-bytes-lang"
+
+
+class FakeConnection:
+    """Minimal asyncpg-ersättare med en products-tabell i minnet"""
+
+    def __init__(self, products):
+        self.products = dict(products)
+
+    @asynccontextmanager
+    async def _transaction(self):
+        snapshot = dict(self.products)
+        try:
+            yield
+        except Exception:
+            self.products = snapshot
+            raise
+
+    def transaction(self):
+        return self._transaction()
+
+    async def fetch(self, query, *args):
+        if query == queries.DECREASE_STOCK:
+            rows = []
+            for sku, qty in zip(*args):
+                if sku in self.products and self.products[sku] >= qty:
+                    self.products[sku] -= qty
+                    rows.append({"sku": sku, "stock": self.products[sku]})
+            return rows
+        if query == queries.INCREASE_STOCK:
+            rows = []
+            for sku, qty in zip(*args):
+                if sku in self.products:
+                    self.products[sku] += qty
+                    rows.append({"sku": sku, "stock": self.products[sku]})
+            return rows
+        if query == queries.SELECT_EXISTING_SKUS:
+            return [{"sku": sku} for sku in args[0] if sku in self.products]
+        raise AssertionError(f"Oväntad query: {query}")
+
+
+def make_token(role=None, exp_delta=60, key=SECRET):
+    payload = {"sub": "1", "email": "test@example.com", "exp": int(time.time()) + exp_delta}
+    if role is not None:
+        payload["role"] = role
+    return jwt.encode(payload, key, algorithm="HS256")
+
+
+@pytest.fixture(autouse=True)
+def secret_key(monkeypatch):
+    monkeypatch.setattr(dependencies, "_SECRET_KEY_B", SECRET.encode())
+    dependencies._jwt_cache.clear()
+    yield
+    dependencies._jwt_cache.clear()
+
+
+@pytest.fixture
+def con():
+    return FakeConnection({"foo": 10, "bar": 5})
+
+
+@pytest.fixture
+def client(con):
+    async def fake_db_conn():
+        yield con
+
+    main.app.dependency_overrides[main.db_conn] = fake_db_conn
+    yield TestClient(main.app)
+    main.app.dependency_overrides.clear()
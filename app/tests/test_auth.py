@@ -0,0 +1,90 @@
+import hashlib
+import time
+import jwt
+from app.auth import dependencies
+from app.tests.conftest import make_token
+
+DECREASE_BODY = {"items": [{"productCode": "foo", "quantity": 1}]}
+
+
+def cache_key(token):
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+def count_decode_calls(monkeypatch):
+    calls = []
+    real_decode = jwt.decode
+
+    def counting_decode(*args, **kwargs):
+        calls.append(args[0])
+        return real_decode(*args, **kwargs)
+
+    monkeypatch.setattr(dependencies.jwt, "decode", counting_decode)
+    return calls
+
+
+def test_cached_token_is_not_decoded_again(client, monkeypatch):
+    calls = count_decode_calls(monkeypatch)
+    token = make_token(role=["admin"])
+    headers = {"Authorization": f"Bearer {token}"}
+
+    first = client.post("/inventory/decrease", json=DECREASE_BODY, headers=headers)
+    second = client.post("/inventory/decrease", json=DECREASE_BODY, headers=headers)
+
+    assert first.status_code == 200
+    assert second.status_code == 200
+    assert len(calls) == 1
+    assert cache_key(token) in dependencies._jwt_cache
+
+
+def test_expired_cached_token_is_evicted(client):
+    token = make_token(role=["admin"], exp_delta=-10)
+    key = cache_key(token)
+    dependencies._jwt_cache[key] = jwt.decode(
+        token, dependencies._SECRET_KEY_B, algorithms=["HS256"], options={"verify_exp": False}
+    )
+
+    response = client.post("/inventory/decrease", json=DECREASE_BODY, headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Token har gått ut"
+    assert key not in dependencies._jwt_cache
+
+
+def test_invalid_signature_is_not_cached(client, monkeypatch):
+    calls = count_decode_calls(monkeypatch)
+    token = make_token(role=["admin"], key="fel-nyckel-som-ocksa-ar-minst-32-bytes")
+    headers = {"Authorization": f"Bearer {token}"}
+
+    for _ in range(2):
+        response = client.post("/inventory/decrease", json=DECREASE_BODY, headers=headers)
+        assert response.status_code == 401
+        assert response.json()["detail"] == "Kunde inte validera dina uppgifter"
+
+    assert len(calls) == 2
+    assert cache_key(token) not in dependencies._jwt_cache
+
+
+def assert_rejected(response):
+    assert response.status_code == 401
+    assert response.json()["detail"] == "Kunde inte validera dina uppgifter"
+    assert response.headers["WWW-Authenticate"] == "Bearer"
+
+
+def test_missing_authorization_header(client):
+    assert_rejected(client.post("/inventory/decrease", json=DECREASE_BODY))
+
+
+def test_non_bearer_scheme(client):
+    token = make_token(role=["admin"])
+    assert_rejected(client.post("/inventory/decrease", json=DECREASE_BODY, headers={"Authorization": f"Basic {token}"}))
+
+
+def test_bearer_with_empty_token(client):
+    assert_rejected(client.post("/inventory/decrease", json=DECREASE_BODY, headers={"Authorization": "Bearer "}))
+
+
+def test_lowercase_bearer_is_accepted(client):
+    token = make_token(role=["admin"])
+    response = client.post("/inventory/decrease", json=DECREASE_BODY, headers={"Authorization": f"bearer {token}"})
+    assert response.status_code == 200
@@ -0,0 +1,71 @@
+import pytest
+from app import main
+
+
+@pytest.fixture(autouse=True)
+def admin_user():
+    async def fake_user():
+        return {"user_id": "1", "email": "admin@example.com", "role": ["admin"], "token": "t"}
+
+    main.app.dependency_overrides[main.get_current_user] = fake_user
+
+
+def decrease(client, *items):
+    return client.post("/inventory/decrease", json={"items": [{"productCode": sku, "quantity": qty} for sku, qty in items]})
+
+
+def test_decrease_sums_duplicate_skus(client, con):
+    response = decrease(client, ("foo", 2), ("foo", 3))
+    assert response.status_code == 200
+    assert response.json() == [{"productCode": "foo", "stock": 5}, {"productCode": "foo", "stock": 5}]
+    assert con.products["foo"] == 5
+
+
+def test_decrease_unknown_sku_rolls_back_batch(client, con):
+    response = decrease(client, ("foo", 2), ("nope", 1))
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Produkten nope finns inte"
+    assert con.products == {"foo": 10, "bar": 5}
+
+
+def test_decrease_insufficient_stock_rolls_back_batch(client, con):
+    response = decrease(client, ("foo", 1), ("bar", 6))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Inte tillräckligt med lagersaldo för bar"
+    assert con.products == {"foo": 10, "bar": 5}
+
+
+def test_decrease_summed_duplicates_exceeding_stock(client, con):
+    response = decrease(client, ("bar", 3), ("bar", 3))
+    assert response.status_code == 400
+    assert con.products["bar"] == 5
+
+
+def test_decrease_validates_quantity_before_existence(client, con):
+    response = decrease(client, ("nope", -1))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Mängden måste vara större än 0"
+
+
+def increase(client, *items):
+    return client.post("/inventory/increase", json=[{"productCode": sku, "quantity": qty} for sku, qty in items])
+
+
+def test_increase_sums_duplicate_skus(client, con):
+    response = increase(client, ("foo", 1), ("foo", 2))
+    assert response.status_code == 200
+    assert response.json() == [{"productCode": "foo", "stock": 13}, {"productCode": "foo", "stock": 13}]
+    assert con.products["foo"] == 13
+
+
+def test_increase_unknown_sku_rolls_back_batch(client, con):
+    response = increase(client, ("foo", 1), ("nope", 1))
+    assert response.status_code == 404
+    assert response.json()["detail"] == "Produkten nope finns inte"
+    assert con.products == {"foo": 10, "bar": 5}
+
+
+def test_increase_validates_quantity_before_existence(client, con):
+    response = increase(client, ("nope", -1))
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Mängden måste vara större än 0"
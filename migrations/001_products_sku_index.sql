@@ -0,0 +1,2 @@
+-- Unikt index på sku, alla endpoints söker och uppdaterar produkter via sku
+CREATE UNIQUE INDEX IF NOT EXISTS products_sku_idx ON products (sku);